@@ -32,6 +32,9 @@ project_root = script_dir.parent
 DATA_DIR = project_root / "data"
 CSV_FILE = DATA_DIR / "merged_output" / "all_works_of_art_le_louvre_merged.csv"
 
+# Taille des blocs du CSV envoyés à COPY (1 MiB au lieu de 8 KiB)
+READ_BUFFER_SIZE = 1 << 20
+
 # Nom de la table dans Supabase
 TABLE_NAME = "all_works_of_art_le_louvre_raw"
 
@@ -85,45 +88,46 @@ def create_connection():
     return engine
 
 
-def load_csv_data():
-    """Charge le fichier CSV"""
-    logger.info(f"Chargement du fichier: {CSV_FILE}")
+def load_csv_columns():
+    """Lit uniquement l'en-tête du CSV et retourne les noms de colonnes nettoyés"""
+    logger.info(f"Lecture de l'en-tête: {CSV_FILE}")
     
     if not CSV_FILE.exists():
         logger.error(f"Fichier non trouvé: {CSV_FILE}")
         return None
     
-    df = pd.read_csv(CSV_FILE, encoding='utf-8-sig')
-    logger.info(f"✓ Données chargées: {len(df):,} lignes, {len(df.columns)} colonnes")
+    header = pd.read_csv(CSV_FILE, encoding='utf-8-sig', nrows=0)
+    columns = [clean_column_name(col) for col in header.columns]
+    logger.info(f"✓ {len(columns)} colonnes détectées: {', '.join(columns[:5])}...")
     
-    return df
+    return columns
 
 
-def prepare_dataframe(df):
-    """Prépare le DataFrame pour l'insertion"""
-    logger.info("Préparation des données...")
-    
-    # Convertir toutes les colonnes en string (varchar)
-    for col in df.columns:
-        df[col] = df[col].astype(str)
-        # Remplacer 'nan' par None pour les vraies valeurs NULL
-        df[col] = df[col].replace('nan', None)
-    
-    # Nettoyer les noms de colonnes pour PostgreSQL
-    df.columns = [col.lower().replace(' ', '_').replace('.', '_') for col in df.columns]
-    
-    logger.info(f"✓ Colonnes nettoyées: {', '.join(df.columns[:5])}...")
-    
-    return df
+def clean_column_name(col):
+    """Nettoie un nom de colonne pour PostgreSQL"""
+    return col.lower().replace(' ', '_').replace('.', '_')
+
 
+def quote_columns(columns):
+    """Retourne la liste de colonnes entre guillemets, prête pour le SQL"""
+    return ', '.join(f'"{col}"' for col in columns)
 
-def create_table_if_not_exists(engine, df):
+
+def build_copy_sql(table_name, cols_sql, options):
+    """Construit l'instruction COPY ... FROM STDIN pour une liste de colonnes déjà quotée"""
+    return (
+        f"COPY {DB_CONFIG['schema']}.{table_name} ({cols_sql}) "
+        f"FROM STDIN WITH ({options})"
+    )
+
+
+def create_table_if_not_exists(engine, columns):
     """Crée la table si elle n'existe pas"""
     logger.info(f"Vérification/création de la table: {TABLE_NAME}")
     
     # Générer la définition de la table (toutes les colonnes en TEXT)
     columns_def = []
-    for col in df.columns:
+    for col in columns:
         columns_def.append(f'"{col}" TEXT')  # TEXT au lieu de VARCHAR
     
     create_table_sql = f"""
@@ -141,45 +145,47 @@ def create_table_if_not_exists(engine, df):
     logger.info(f"✓ Table {TABLE_NAME} prête")
 
 
-def truncate_table(engine):
-    """Vide la table avant insertion"""
-    logger.info(f"Vidage de la table {TABLE_NAME}...")
+def copy_csv_to_supabase(engine, columns, chunk_size=READ_BUFFER_SIZE):
+    """Envoie le fichier CSV tel quel à COPY FROM STDIN, sans passer par pandas
     
-    truncate_sql = f"TRUNCATE TABLE {DB_CONFIG['schema']}.{TABLE_NAME} RESTART IDENTITY;"
+    La table est vidée puis remplie par le COPY dans une seule transaction :
+    en cas d'échec, elle garde son contenu précédent. id (SERIAL) et
+    created_at (DEFAULT NOW()) ne font pas partie des colonnes copiées.
+    """
+    logger.info(f"Chargement du fichier {CSV_FILE.name} via COPY FROM STDIN...")
+    
+    schema = DB_CONFIG['schema']
+    # L'ordre des colonnes suit celui de l'en-tête du CSV
+    cols_sql = quote_columns(columns)
+    copy_sql = build_copy_sql(
+        TABLE_NAME,
+        cols_sql,
+        "FORMAT CSV, HEADER true, NULL '', ENCODING 'UTF8'"
+    )
+    truncate_sql = f"TRUNCATE TABLE {schema}.{TABLE_NAME} RESTART IDENTITY"
     
-    with engine.connect() as conn:
-        conn.execute(text(truncate_sql))
+    conn = engine.raw_connection()
+    try:
+        with conn.cursor() as cursor:
+            # Pas d'attente du fsync du WAL au commit de cette transaction
+            cursor.execute("SET LOCAL synchronous_commit = off")
+            
+            # Vidage de la table (fresh start), annulé avec le reste en cas d'erreur
+            cursor.execute(truncate_sql)
+            
+            with cursor.copy(copy_sql) as copy, open(CSV_FILE, 'rb') as f:
+                while chunk := f.read(chunk_size):
+                    copy.write(chunk)
+            logger.info(f"✓ Fichier copié dans {TABLE_NAME}")
         conn.commit()
+    except Exception as e:
+        conn.rollback()
+        logger.error(f"✗ Erreur COPY: {e}")
+        raise
+    finally:
+        conn.close()
     
-    logger.info("✓ Table vidée")
-
-
-def load_data_to_supabase(df, engine, batch_size=1000):
-    """Charge les données dans Supabase par batch"""
-    logger.info(f"Chargement des données par batch de {batch_size}...")
-    
-    total_rows = len(df)
-    num_batches = (total_rows + batch_size - 1) // batch_size
-    
-    for i in range(0, total_rows, batch_size):
-        batch_num = (i // batch_size) + 1
-        df_batch = df.iloc[i:i+batch_size]
-        
-        try:
-            df_batch.to_sql(
-                TABLE_NAME,
-                engine,
-                schema=DB_CONFIG['schema'],
-                if_exists='append',
-                index=False,
-                method='multi'
-            )
-            logger.info(f"✓ Batch {batch_num}/{num_batches}: {len(df_batch)} lignes insérées")
-        except Exception as e:
-            logger.error(f"✗ Erreur batch {batch_num}: {e}")
-            raise
-    
-    logger.info(f"✓ Toutes les données chargées: {total_rows:,} lignes")
+    logger.info("✓ Fichier CSV chargé")
 
 
 def verify_data(engine):
@@ -203,27 +209,21 @@ def main():
         logger.info("CHARGEMENT DES DONNÉES DANS SUPABASE")
         logger.info("="*60)
         
-        # 1. Charger le CSV
-        df = load_csv_data()
-        if df is None:
+        # 1. Lire l'en-tête du CSV (les données sont envoyées telles quelles)
+        columns = load_csv_columns()
+        if columns is None:
             return
         
-        # 2. Préparer les données
-        df = prepare_dataframe(df)
-        
-        # 3. Créer connexion
+        # 2. Créer connexion
         engine = create_connection()
         
-        # 4. Créer la table si nécessaire
-        create_table_if_not_exists(engine, df)
-        
-        # 5. Vider la table (fresh start)
-        truncate_table(engine)
+        # 3. Créer la table si nécessaire
+        create_table_if_not_exists(engine, columns)
         
-        # 6. Charger les données
-        load_data_to_supabase(df, engine, batch_size=1000)
+        # 4. Vider la table et charger les données (une seule transaction)
+        copy_csv_to_supabase(engine, columns)
         
-        # 7. Vérifier
+        # 5. Vérifier
         count = verify_data(engine)
         
         logger.info("\n" + "="*60)
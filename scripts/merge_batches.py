@@ -1,4 +1,7 @@
-import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
 from pathlib import Path
 import logging
 from datetime import datetime
@@ -16,17 +19,131 @@ project_root = script_dir.parent
 BATCHES_DIR = project_root / "data" / "output_batches"
 OUTPUT_DIR = project_root / "data" / "merged_output"
 
+# Taille du buffer de lecture des fichiers (1 MiB au lieu de 8 KiB)
+READ_BUFFER_SIZE = 1 << 20
+
+# Colonnes non nécessaires, supprimées avant la sauvegarde
+COLUMNS_TO_DROP = [
+    'index.Original artwork',
+    'titleComplement',
+    'index.Imagery',
+    'index.Language',
+    'objectNumber',
+    'printsDrawingsEntity',
+    'printsDrawingsCollection',
+    'index.Names and titles',
+    'index.Script',
+    'index.Nature of text',
+    'jabachInventory',
+    'historicalContext',
+    'provenance',
+    'shape',
+    'onomastics',
+    'namesAndTitles',
+    'printState',
+    'originalObject',
+    'index',
+    'index.Description/Features',
+    'index.objectType',
+    'napoleonInventory',
+    'bibliography',
+    'exhibition',
+    'relatedWork',
+    'objectType',
+    'relatedWork',
+    'inscriptions',
+    'index.Places',
+    'index.Subjects',
+    'index.collection',
+    'index.People',
+    'longTermLoanTo',
+    'index.Name',
+    'placeOfCreation',
+    'dateOfDiscovery',
+    'placeOfDiscovery',
+    'materialsAndTechniques',
+    'index.Materials',
+    "index.Mode d'acquisition",
+    'modified ',
+    'denominationTitle',
+    'previousOwner',
+    'ownedBy',
+    'heldBy',
+    'objectHistory',
+    'dimension',
+    'isMuseesNationauxRecuperation',
+    'displayDateCreated',
+    'currentLocation',
+    'room',
+    'index.technic',
+    'index.Period'
+]
+
+# Colonnes utilisées par le filtre : lues même si elles font partie des
+# colonnes à supprimer, puis supprimées une fois le batch filtré
+FILTER_COLUMNS = ['title', 'currentLocation']
+
+def get_columns_to_read(header):
+    """Retourne les colonnes d'un batch à lire (sans les colonnes non nécessaires)"""
+    return [
+        col for col in header
+        if col not in COLUMNS_TO_DROP or col in FILTER_COLUMNS
+    ]
+
+def get_columns_to_keep(table):
+    """Retourne les colonnes d'une table à conserver une fois le filtrage effectué"""
+    return [col for col in table.column_names if col not in COLUMNS_TO_DROP]
+
+def filter_batch_table(table, has_title, has_current_location):
+    """Filtre un batch selon les critères métier et supprime les colonnes de filtrage
+    
+    has_title / has_current_location indiquent si la colonne existe dans au moins
+    un batch : un batch sans titre alors que d'autres en ont est entièrement exclu.
+    """
+    if has_title and 'title' not in table.column_names:
+        return table.select(get_columns_to_keep(table)).slice(0, 0)
+    
+    mask = None
+    if has_title:
+        mask = pc.is_valid(table['title'])
+    if has_current_location and 'currentLocation' in table.column_names:
+        # Une localisation absente compte comme exposée
+        exposed = pc.fill_null(pc.not_equal(table['currentLocation'], 'non exposé'), True)
+        mask = exposed if mask is None else pc.and_(mask, exposed)
+    
+    if mask is not None:
+        table = table.filter(mask)
+    
+    return table.select(get_columns_to_keep(table))
+
 def validate_batch_file(batch_path):
-    """Valide qu'un fichier batch est lisible et non vide"""
+    """Valide qu'un fichier batch est lisible et non vide
+    
+    Seules les métadonnées Parquet sont lues ; les noms de colonnes sont
+    retournés (None si le batch est invalide) pour être réutilisés à la lecture.
+    """
     try:
-        df = pd.read_csv(batch_path, encoding='utf-8-sig', nrows=5)
-        if len(df) == 0:
+        parquet_file = pq.ParquetFile(batch_path)
+        if parquet_file.metadata.num_rows == 0:
             logger.warning(f"Batch vide détecté: {batch_path.name}")
-            return False
-        return True
+            return None
+        return parquet_file.schema_arrow.names
     except Exception as e:
         logger.error(f"Erreur lors de la lecture de {batch_path.name}: {e}")
-        return False
+        return None
+
+def read_batch_file(batch_path, columns):
+    """Lit les colonnes utiles d'un fichier batch en table Arrow (toutes en string)"""
+    try:
+        # Les batches sont écrits en string par le scraper : aucune inférence de type
+        return pq.read_table(
+            batch_path,
+            columns=columns,
+            buffer_size=READ_BUFFER_SIZE
+        )
+    except Exception as e:
+        logger.error(f"Erreur lors du chargement de {batch_path.name}: {e}")
+        return None
 
 def merge_all_batches():
     """Fusionne tous les fichiers batch en un seul DataFrame"""
@@ -41,7 +158,7 @@ def merge_all_batches():
         return None
     
     # Récupérer tous les fichiers batch (triés par ordre numérique)
-    batch_files = sorted(BATCHES_DIR.glob("batch_*.csv"))
+    batch_files = sorted(BATCHES_DIR.glob("batch_*.parquet"))
     
     if not batch_files:
         logger.error("Aucun fichier batch trouvé!")
@@ -51,10 +168,11 @@ def merge_all_batches():
     
     # Valider tous les batches avant de commencer
     logger.info("\n--- VALIDATION DES BATCHES ---")
-    valid_batches = []
+    valid_batches = {}
     for batch_path in batch_files:
-        if validate_batch_file(batch_path):
-            valid_batches.append(batch_path)
+        header = validate_batch_file(batch_path)
+        if header is not None:
+            valid_batches[batch_path] = header
             logger.info(f"✓ {batch_path.name} - OK")
         else:
             logger.warning(f"✗ {batch_path.name} - SKIP")
@@ -65,34 +183,72 @@ def merge_all_batches():
     
     logger.info(f"\nBatches valides: {len(valid_batches)}/{len(batch_files)}")
     
-    # Charger et concaténer tous les batches
+    # Les colonnes inutiles ne sont jamais lues
+    logger.info("\n--- SUPPRESSION DES COLONNES INUTILES ---")
+    batch_columns = set().union(*valid_batches.values())
+    dropped_cols = [
+        col for col in dict.fromkeys(COLUMNS_TO_DROP)
+        if col in batch_columns and col not in FILTER_COLUMNS
+    ]
+    missing_cols = [col for col in COLUMNS_TO_DROP if col not in batch_columns]
+    
+    if missing_cols:
+        logger.warning(f"⚠ Colonnes introuvables: {', '.join(missing_cols)}")
+    logger.info(f"✓ {len(dropped_cols)} colonnes ignorées à la lecture")
+    
+    # Le filtre est appliqué à chaque batch dès sa lecture
+    logger.info("\n--- FILTRAGE DES DONNÉES ---")
+    has_title = 'title' in batch_columns
+    has_current_location = 'currentLocation' in batch_columns
+    
+    logger.info(f"Colonnes disponibles pour filtrage:")
+    logger.info(f"  - title: {has_title}")
+    logger.info(f"  - currentLocation: {has_current_location}")
+    
+    if has_title and has_current_location:
+        logger.info("📊 Filtre: titre présent ET œuvre exposée")
+    elif has_title:
+        logger.info("📊 Filtre: titre présent uniquement")
+    elif has_current_location:
+        logger.info("📊 Filtre: œuvre exposée uniquement")
+    else:
+        logger.warning("⚠ Aucune colonne de filtrage trouvée")
+    
+    # Charger, filtrer et concaténer tous les batches
     logger.info("\n--- CHARGEMENT DES DONNÉES ---")
-    dfs = []
+    tables = []
     total_rows = 0
+    kept_rows = 0
     
-    for batch_path in valid_batches:
-        try:
-            df = pd.read_csv(batch_path, encoding='utf-8-sig')
-            rows = len(df)
-            total_rows += rows
-            dfs.append(df)
-            logger.info(f"Chargé {batch_path.name}: {rows:,} lignes")
-        except Exception as e:
-            logger.error(f"Erreur lors du chargement de {batch_path.name}: {e}")
+    # Lecture colonnaire des fichiers Parquet, sans re-parsing
+    for batch_path, header in valid_batches.items():
+        table = read_batch_file(batch_path, get_columns_to_read(header))
+        if table is None:
             continue
-    
-    if not dfs:
+        rows = table.num_rows
+        table = filter_batch_table(table, has_title, has_current_location)
+        total_rows += rows
+        kept_rows += table.num_rows
+        tables.append(table)
+        logger.info(f"Chargé {batch_path.name}: {rows:,} lignes ({table.num_rows:,} conservées)")
+    
+    if not tables:
         logger.error("Aucune donnée chargée!")
         return None
     
+    rows_removed = total_rows - kept_rows
+    logger.info(f"\nLignes initiales: {total_rows:,}")
+    logger.info(f"Lignes conservées: {kept_rows:,}")
+    logger.info(f"Lignes supprimées: {rows_removed:,} ({rows_removed/total_rows*100:.1f}%)")
+    
     # Analyser les colonnes de chaque batch
     logger.info("\n--- ANALYSE DES COLONNES ---")
     all_columns = set()
     batch_column_counts = {}
     
-    for i, df in enumerate(dfs):
+    for i, table in enumerate(tables):
         batch_num = i + 1
-        cols = set(df.columns)
+        cols = set(table.column_names)
         all_columns.update(cols)
         batch_column_counts[batch_num] = len(cols)
         logger.info(f"Batch {batch_num}: {len(cols)} colonnes")
@@ -102,11 +258,23 @@ def merge_all_batches():
     # Identifier les batches avec des colonnes différentes
     if len(set(batch_column_counts.values())) > 1:
         logger.warning("⚠️  Nombre de colonnes différent entre les batches!")
-        logger.info("Pandas va automatiquement gérer les colonnes manquantes avec NaN")
+        logger.info("Arrow va automatiquement gérer les colonnes manquantes avec null")
     
-    # Concaténer tous les DataFrames (join='outer' par défaut)
+    # Concaténer toutes les tables (sans copie des lignes), puis convertir
+    # en DataFrame une seule fois
     logger.info("\n--- CONCATÉNATION ---")
-    df_combined = pd.concat(dfs, ignore_index=True, sort=False)
+    combined = pa.concat_tables(tables, promote_options='default')
+    # Libérer les références aux tables pour que self_destruct puisse rendre
+    # la mémoire Arrow colonne par colonne pendant la conversion
+    tables.clear()
+    # ignore_metadata : colonnes object (None pour les valeurs manquantes)
+    # plutôt que le dtype 'string' enregistré par le scraper
+    df_combined = combined.to_pandas(
+        split_blocks=True,
+        self_destruct=True,
+        ignore_metadata=True
+    )
+    del combined
     logger.info(f"Total de lignes après concaténation: {len(df_combined):,}")
     logger.info(f"Total de colonnes après concaténation: {len(df_combined.columns)}")
     
@@ -116,11 +284,13 @@ def merge_all_batches():
     
     # On suppose qu'il y a une colonne 'url' ou 'id' pour identifier les doublons
     # Ajuste selon ta structure de données
+    # Masque calculé sur la seule colonne clé, puis une seule sélection
+    # (évite la double allocation de drop_duplicates sur un DataFrame large)
     if 'url' in df_combined.columns:
-        df_cleaned = df_combined.drop_duplicates(subset=['url'], keep='first')
+        df_cleaned = df_combined.loc[~df_combined['url'].duplicated(keep='first')]
         logger.info(f"Doublons supprimés basés sur 'url'")
     elif 'id' in df_combined.columns:
-        df_cleaned = df_combined.drop_duplicates(subset=['id'], keep='first')
+        df_cleaned = df_combined.loc[~df_combined['id'].duplicated(keep='first')]
         logger.info(f"Doublons supprimés basés sur 'id'")
     else:
         # Suppression des doublons complets si pas de colonne clé
@@ -147,120 +317,6 @@ def merge_all_batches():
     
     return df_cleaned
 
-def filter_dataframe(df):
-    """Filtre les données selon les critères métier"""
-    logger.info("\n--- FILTRAGE DES DONNÉES ---")
-    initial_rows = len(df)
-    
-    has_title = 'title' in df.columns
-    has_current_location = 'currentLocation' in df.columns
-    
-    logger.info(f"Colonnes disponibles pour filtrage:")
-    logger.info(f"  - title: {has_title}")
-    logger.info(f"  - currentLocation: {has_current_location}")
-    
-    if has_title and has_current_location:
-        mask = (
-            df['title'].notna() & 
-            (df['currentLocation'] != 'non exposé')
-        )
-        logger.info("📊 Filtre: titre présent ET œuvre exposée")
-    elif has_title:
-        mask = df['title'].notna()
-        logger.info("📊 Filtre: titre présent uniquement")
-    elif has_current_location:
-        mask = df['currentLocation'] != 'non exposé'
-        logger.info("📊 Filtre: œuvre exposée uniquement")
-    else:
-        logger.warning("⚠ Aucune colonne de filtrage trouvée")
-        mask = pd.Series([True] * len(df), index=df.index)
-    
-    df_filtered = df[mask].copy()
-    
-    rows_removed = initial_rows - len(df_filtered)
-    logger.info(f"Lignes initiales: {initial_rows:,}")
-    logger.info(f"Lignes conservées: {len(df_filtered):,}")
-    logger.info(f"Lignes supprimées: {rows_removed:,} ({rows_removed/initial_rows*100:.1f}%)")
-    
-    return df_filtered
-
-
-def drop_unnecessary_columns(df):
-    """Supprime les colonnes non nécessaires"""
-    logger.info("\n--- SUPPRESSION DES COLONNES INUTILES ---")
-    
-    columns_to_drop = [
-        'index.Original artwork',
-        'titleComplement',
-        'index.Imagery',
-        'index.Language',
-        'objectNumber',
-        'printsDrawingsEntity',
-        'printsDrawingsCollection',
-        'index.Names and titles',
-        'index.Script',
-        'index.Nature of text',
-        'jabachInventory',
-        'historicalContext',
-        'provenance',
-        'shape',
-        'onomastics',
-        'namesAndTitles',
-        'printState',
-        'originalObject',
-        'index',
-        'index.Description/Features',
-        'index.objectType',
-        'napoleonInventory',
-        'bibliography',
-        'exhibition',
-        'relatedWork',
-        'objectType',
-        'relatedWork',
-        'inscriptions',
-        'index.Places',
-        'index.Subjects',
-        'index.collection',
-        'index.People',
-        'longTermLoanTo',
-        'index.Name',
-        'placeOfCreation',
-        'dateOfDiscovery',
-        'placeOfDiscovery',
-        'materialsAndTechniques',
-        'index.Materials',
-        "index.Mode d'acquisition",
-        'modified ',
-        'denominationTitle',
-        'previousOwner',
-        'ownedBy',
-        'heldBy',
-        'objectHistory',
-        'dimension',
-        'isMuseesNationauxRecuperation',
-        'displayDateCreated',
-        'currentLocation',
-        'room',
-        'index.technic',
-        'index.Period'
-    ]
-    
-    existing_cols_to_drop = [col for col in columns_to_drop if col in df.columns]
-    missing_cols = [col for col in columns_to_drop if col not in df.columns]
-    
-    if missing_cols:
-        logger.warning(f"⚠ Colonnes introuvables: {', '.join(missing_cols)}")
-    
-    if existing_cols_to_drop:
-        initial_cols = len(df.columns)
-        df = df.drop(columns=existing_cols_to_drop)
-        logger.info(f"✓ {len(existing_cols_to_drop)} colonnes supprimées")
-        logger.info(f"📊 Colonnes: {initial_cols} → {len(df.columns)}")
-    else:
-        logger.info("ℹ Aucune colonne à supprimer")
-    
-    return df
-
 def save_merged_data(df):
     """Sauvegarde le DataFrame mergé"""
     
@@ -274,13 +330,13 @@ def save_merged_data(df):
     filename = "all_works_of_art_le_louvre_merged.csv"
     filepath = OUTPUT_DIR / filename
     
-    # Sauvegarder
+    # Sauvegarder avec l'écrivain CSV d'Arrow (C++ multi-thread) plutôt que
+    # DataFrame.to_csv ; les valeurs manquantes sont écrites en champ vide
     try:
-        df.to_csv(
+        pacsv.write_csv(
+            pa.Table.from_pandas(df, preserve_index=False),
             filepath,
-            index=False,
-            encoding='utf-8-sig',
-            escapechar='\\'
+            write_options=pacsv.WriteOptions(include_header=True)
         )
         logger.info(f"✓ Fichier sauvegardé: {filepath}")
         logger.info(f"  Taille: {filepath.stat().st_size / (1024*1024):.2f} MB")
@@ -302,12 +358,6 @@ def main():
     
     if df_merged is not None:
 
-        # Filtrer les données
-        df_merged = filter_dataframe(df_merged)
-        
-        # Supprimer les colonnes inutiles
-        df_merged = drop_unnecessary_columns(df_merged)
-
         # Sauvegarder
         output_file = save_merged_data(df_merged)
         
@@ -5,7 +5,6 @@ Usage: python run_dbt.py
 
 import os
 import sys
-import subprocess
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -30,26 +29,31 @@ print(f"  SUPABASE_PORT: {os.getenv('SUPABASE_PORT')}")
 print(f"  SUPABASE_DATABASE: {os.getenv('SUPABASE_DATABASE')}")
 print()
 
-# Lancer dbt build
-dbt_command = ['dbt', 'build']
+# Lancer dbt build dans le même processus (pas de nouvel interpréteur à démarrer)
+try:
+    from dbt.cli.main import dbtRunner
+except ImportError:
+    print("\n❌ Erreur: dbt n'est pas installé dans cet environnement Python")
+    print("Installez dbt avec: pip install dbt-postgres")
+    sys.exit(1)
+
+dbt_args = ['build', '--project-dir', str(dbt_dir)]
 
-print(f"Exécution: {' '.join(dbt_command)}")
+print(f"Exécution: dbt {' '.join(dbt_args)}")
 print(f"Dossier de travail: {dbt_dir}")
 print("=" * 60)
 print()
 
+# Même dossier de travail qu'avant (recherche du profiles.yml)
+os.chdir(dbt_dir)
+
 try:
-    result = subprocess.run(
-        dbt_command,
-        env=os.environ.copy(),
-        cwd=dbt_dir
-    )
-    sys.exit(result.returncode)
-    
-except FileNotFoundError:
-    print("\n❌ Erreur: dbt n'est pas installé ou n'est pas dans le PATH")
-    print("Installez dbt avec: pip install dbt-postgres")
-    sys.exit(1)
+    # Les variables du .env sont déjà dans os.environ de ce processus
+    result = dbtRunner().invoke(dbt_args)
+    # Mêmes codes de sortie que la CLI dbt : 1 si échec, 2 si erreur non gérée
+    if result.success:
+        sys.exit(0)
+    sys.exit(2 if result.exception else 1)
     
 except KeyboardInterrupt:
     print("\n\n⚠ Commande interrompue par l'utilisateur")
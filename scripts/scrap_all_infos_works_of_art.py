@@ -1,11 +1,19 @@
 import aiohttp
 import os
 import asyncio
+import random
+import time
+from collections import deque
 import pandas as pd
-import json
-import nest_asyncio
+import pyarrow as pa
+import pyarrow.parquet as pq
+import orjson
 from pathlib import Path
 import logging
+from dotenv import load_dotenv
+
+# Charger les variables d'environnement (utilisées par le chargement en continu)
+load_dotenv()
 
 # Configuration du logging
 logging.basicConfig(
@@ -14,12 +22,33 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-nest_asyncio.apply()
+# Boucle d'événements uvloop (libuv) si disponible (non supporté sous Windows)
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
 
 # Configuration
 BATCH_SIZE = 5000  # Réduit à 5000 pour plus de stabilité
-MAX_CONCURRENT_REQUESTS = 50  # Limite les requêtes simultanées
+MAX_CONCURRENT_REQUESTS = 50  # Limite initiale des requêtes simultanées
+MIN_CONCURRENT_REQUESTS = 10  # Bornes de l'ajustement automatique (AIMD)
+MAX_CONCURRENT_REQUESTS_CEILING = 200
 REQUEST_TIMEOUT = 30  # Timeout en secondes
+READ_BUFFER_SIZE = 1 << 20  # Buffer de lecture des fichiers (1 MiB)
+MAX_RETRIES = 3  # Nombre de tentatives par URL
+
+# Circuit breaker : au-delà de N erreurs serveur en T secondes, le batch
+# suivant ne fait qu'une seule tentative par URL
+CIRCUIT_BREAKER_THRESHOLD = 100
+CIRCUIT_BREAKER_WINDOW = 60  # secondes
+recent_failures = deque()  # Timestamps des dernières erreurs serveur
+
+# Chargement en continu dans Supabase pendant le scraping (désactivé par défaut)
+STREAM_TO_SUPABASE = os.getenv('STREAM_TO_SUPABASE', '0') == '1'
+COPY_BATCH_SIZE = 10_000  # Nombre de lignes envoyées par COPY
+COPY_QUEUE_SIZE = 2 * COPY_BATCH_SIZE  # Lignes en attente du consumer au maximum
+SUPABASE_SCHEMA = 'source_raw'
+SUPABASE_TABLE = 'all_works_of_art_le_louvre_raw'
 
 script_dir = Path(__file__).parent
 # Remonter au dossier parent (racine du projet)
@@ -29,68 +58,298 @@ project_root = script_dir.parent
 OUTPUT_DIR = project_root / "data" / "output_batches"
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)  # parents=True crée les dossiers parents si nécessaire
 
-# Chemin vers le fichier JSON d'input
-json_path = project_root / "data" / "urls_le_louvre_all.json"
+# Chemin vers le fichier JSON Lines (gzip) d'input
+json_path = project_root / "data" / "urls_le_louvre_all.jsonl.gz"
+# Copie Arrow (IPC) des URLs, lue par memory-map et partagée entre processus
+urls_arrow_path = project_root / "data" / "urls_le_louvre_all.arrow"
+
+# Découpage en shards pour lancer plusieurs processus de scraping en parallèle
+SHARD_ID = int(os.getenv('SHARD_ID', '0'))
+NUM_SHARDS = int(os.getenv('NUM_SHARDS', '1'))
+if not 0 <= SHARD_ID < NUM_SHARDS:
+    raise ValueError(f"SHARD_ID must be between 0 and NUM_SHARDS - 1 (got {SHARD_ID} for {NUM_SHARDS} shards)")
+
+# Fonction pour charger la liste des URLs (conversion JSON -> Arrow une seule fois)
+def load_urls():
+    if not urls_arrow_path.exists() or urls_arrow_path.stat().st_mtime < json_path.stat().st_mtime:
+        with open(json_path, 'rb', buffering=READ_BUFFER_SIZE) as f:
+            df_urls = pd.read_json(f, lines=True, compression='gzip')
+            table = pa.Table.from_pandas(df_urls[['url']], preserve_index=False)
+        # Écriture dans un fichier temporaire puis renommage atomique (shards concurrents)
+        tmp_path = urls_arrow_path.with_suffix(f'.arrow.{os.getpid()}.tmp')
+        with pa.OSFile(str(tmp_path), 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, urls_arrow_path)
+        logger.info(f"Arrow copy of the URL list written to {urls_arrow_path}")
+    
+    # Buffers memory-mappés : pas de re-parsing du JSON, mémoire partagée par l'OS ;
+    # seules les URLs du shard sont converties en objets Python
+    with pa.memory_map(str(urls_arrow_path)) as source:
+        column = pa.ipc.open_file(source).read_all().column('url')
+        shard_indices = pa.array(range(SHARD_ID, len(column), NUM_SHARDS))
+        return column.take(shard_indices).to_pylist()
+
+urls = load_urls()
+logger.info(f"Nombre total d'URLs à scraper : {len(urls)} (shard {SHARD_ID + 1}/{NUM_SHARDS})")
+
+# Chemin d'un fichier batch (suffixé par le shard si le scraping est partagé)
+def batch_file_path(batch_number):
+    if NUM_SHARDS > 1:
+        return OUTPUT_DIR / f"batch_{batch_number:04d}_shard{SHARD_ID:02d}.parquet"
+    return OUTPUT_DIR / f"batch_{batch_number:04d}.parquet"
 
-# Lire le fichier JSON
-df_urls = pd.read_json(json_path)
-logger.info(f"Nombre total d'URLs à scraper : {len(df_urls)}")
+# Function to record a server-side failure (5xx, timeout, connection error)
+def record_failure():
+    now = time.monotonic()
+    recent_failures.append(now)
+    while recent_failures and now - recent_failures[0] > CIRCUIT_BREAKER_WINDOW:
+        recent_failures.popleft()
+
+# Function to check whether too many server failures happened recently
+def circuit_open():
+    now = time.monotonic()
+    while recent_failures and now - recent_failures[0] > CIRCUIT_BREAKER_WINDOW:
+        recent_failures.popleft()
+    return len(recent_failures) >= CIRCUIT_BREAKER_THRESHOLD
+
+# Semaphore whose number of permits is adapted between batches (AIMD):
+# +ADDITIVE_STEP when requests succeed with stable latency, halved on congestion
+class AdaptiveSemaphore:
+    ADDITIVE_STEP = 10
+    SUCCESS_THRESHOLD = 0.98  # Share of successful requests needed to raise the limit
+    CONGESTION_THRESHOLD = 0.01  # Share of congested requests that halves the limit
+    
+    def __init__(self, initial, minimum, maximum):
+        self.limit = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.success_rate = 1.0  # Statistics of the last batch
+        self.latency = None
+        self._previous_latency = None
+        self._reset_counters()
+        self._in_flight = 0
+        self._condition = asyncio.Condition()
+    
+    def _reset_counters(self):
+        self._results = 0
+        self._successes = 0
+        self._congested = 0
+        self._latency_total = 0.0
+    
+    async def __aenter__(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self._in_flight < self.limit)
+            self._in_flight += 1
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        async with self._condition:
+            self._in_flight -= 1
+            self._condition.notify()
+    
+    def on_result(self, success, latency, congested=False):
+        self._results += 1
+        self._successes += success
+        self._congested += congested
+        self._latency_total += latency
+    
+    def adjust(self):
+        # Decision based on the whole batch (success ratio and mean latency)
+        if not self._results:
+            return self.limit
+        self.success_rate = self._successes / self._results
+        self.latency = self._latency_total / self._results
+        if self._congested / self._results > self.CONGESTION_THRESHOLD:
+            self.limit = max(self.minimum, self.limit // 2)
+        elif self.success_rate > self.SUCCESS_THRESHOLD and (
+            self._previous_latency is None or self.latency <= self._previous_latency * 1.1
+        ):
+            self.limit = min(self.maximum, self.limit + self.ADDITIVE_STEP)
+        self._previous_latency = self.latency
+        self._reset_counters()
+        return self.limit
 
 # Function to fetch data from a single URL
 async def fetch(session, url, semaphore):
     async with semaphore:  # Limite le nombre de requêtes concurrentes
+        start = time.monotonic()
+        result = None
+        congested = False  # Timeout, 429 or 5xx: the server is struggling
+        not_found = False  # Dead link: the server answered normally
         try:
             timeout = aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
             async with session.get(url, timeout=timeout) as response:
+                if response.status >= 500 or response.status == 429:
+                    congested = True
+                    record_failure()
+                if response.status in (404, 410):
+                    not_found = True
                 if response.status != 200:
                     logger.warning(f"Non-200 response for URL: {url} with status: {response.status}")
                     return None
                 if 'application/json' not in response.headers.get('Content-Type', ''):
                     logger.warning(f"Non-JSON response for URL: {url}")
                     return None
-                return await response.json()
+                # orjson parses the raw bytes directly, faster than the stdlib json path
+                result = orjson.loads(await response.read())
+                return result
         except asyncio.TimeoutError:
+            congested = True
+            record_failure()
             logger.error(f"Timeout for URL: {url}")
             return None
         except aiohttp.ClientError as e:
+            congested = True
+            record_failure()
             logger.error(f"Request failed for URL: {url} - {type(e).__name__}: {e}")
             return None
         except Exception as e:
             logger.error(f"Unexpected error for URL: {url} - {type(e).__name__}: {e}")
             return None
+        finally:
+            semaphore.on_result(result is not None or not_found, time.monotonic() - start, congested)
 
-# Function to handle retries with exponential backoff
-async def fetch_with_retry(session, url, semaphore, retries=3):
+# Function to handle retries with jittered exponential backoff
+async def fetch_with_retry(session, url, semaphore, retries=MAX_RETRIES):
     for attempt in range(retries):
         result = await fetch(session, url, semaphore)
         if result is not None:
             return result
         if attempt < retries - 1:
-            wait_time = 2 ** attempt
-            logger.debug(f"Retry {attempt + 1}/{retries} for {url} after {wait_time}s")
+            # Jitter so that concurrent failures do not all retry in lockstep
+            wait_time = (2 ** attempt) * (0.5 + random.random())
+            logger.debug(f"Retry {attempt + 1}/{retries} for {url} after {wait_time:.1f}s")
             await asyncio.sleep(wait_time)
     logger.error(f"Failed to fetch URL after {retries} retries: {url}")
     return None
 
-# Function to fetch data from all URLs with controlled concurrency
-async def fetch_batch(urls, batch_number):
-    semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
-    
-    async with aiohttp.ClientSession() as session:
-        tasks = []
-        for url in urls:
-            full_url = f"https://collections.louvre.fr{url}.json"
-            tasks.append(fetch_with_retry(session, full_url, semaphore))
-        
-        logger.info(f"Batch {batch_number}: Fetching {len(tasks)} URLs...")
-        results = await asyncio.gather(*tasks)
+# Function to flatten a single JSON record into a row for the raw table
+def to_db_record(data):
+    record = pd.json_normalize(data).to_dict('records')[0]
+    # Same column names as load_to_supabase.py, every value stored as TEXT
+    return {
+        key.lower().replace(' ', '_').replace('.', '_'): None if value is None else str(value)
+        for key, value in record.items()
+    }
+
+# Function applying the rules of merge_batches.py to a streamed record:
+# a title, works on display only, and one row per url
+def keep_record(record, seen_urls):
+    if not record.get('title'):
+        return False
+    if record.get('currentlocation') == 'non exposé':
+        return False
+    url = record.get('url')
+    if url is not None:
+        if url in seen_urls:
+            return False
+        seen_urls.add(url)
+    return True
+
+# Consumer task: lands records in Supabase with COPY as they are scraped
+async def copy_consumer(queue, truncate=False):
+    import asyncpg
+    
+    conn = await asyncpg.connect(
+        host=os.getenv('SUPABASE_HOST'),
+        port=os.getenv('SUPABASE_PORT', 5432),
+        user=os.getenv('SUPABASE_USER'),
+        password=os.getenv('SUPABASE_PASSWORD'),
+        database=os.getenv('SUPABASE_DATABASE')
+    )
+    
+    async def flush(rows):
+        await conn.copy_records_to_table(
+            SUPABASE_TABLE, records=rows, columns=columns, schema_name=SUPABASE_SCHEMA
+        )
+        logger.info(f"COPY: {len(rows)} rows sent to {SUPABASE_SCHEMA}.{SUPABASE_TABLE}")
+    
+    try:
+        # The table (created by load_to_supabase.py) defines the columns to keep
+        columns = [
+            row['column_name'] for row in await conn.fetch(
+                "SELECT column_name FROM information_schema.columns "
+                "WHERE table_schema = $1 AND table_name = $2 "
+                "AND column_name NOT IN ('id', 'created_at') "
+                "ORDER BY ordinal_position",
+                SUPABASE_SCHEMA, SUPABASE_TABLE
+            )
+        ]
+        if not columns:
+            raise RuntimeError(
+                f"Table {SUPABASE_SCHEMA}.{SUPABASE_TABLE} not found, run load_to_supabase.py first"
+            )
         
-        # Statistiques
-        successful = sum(1 for r in results if r is not None)
-        failed = len(results) - successful
-        logger.info(f"Batch {batch_number}: {successful} successful, {failed} failed")
+        if truncate:
+            await conn.execute(f"TRUNCATE TABLE {SUPABASE_SCHEMA}.{SUPABASE_TABLE} RESTART IDENTITY")
         
-        return results
+        rows = []
+        seen_urls = set()
+        while (record := await queue.get()) is not None:
+            if not keep_record(record, seen_urls):
+                continue
+            rows.append(tuple(record.get(col) for col in columns))
+            if len(rows) >= COPY_BATCH_SIZE:
+                await flush(rows)
+                rows = []
+        if rows:
+            await flush(rows)
+    finally:
+        await conn.close()
+
+# Shared HTTP session for the whole run: connections are kept alive and
+# reused across batches instead of being re-opened for every batch
+def create_session():
+    connector = aiohttp.TCPConnector(
+        limit=MAX_CONCURRENT_REQUESTS_CEILING,
+        ttl_dns_cache=300,
+        keepalive_timeout=60
+    )
+    return aiohttp.ClientSession(connector=connector)
+
+# Concurrency limiter shared by all batches of a run, starting at MAX_CONCURRENT_REQUESTS
+def create_semaphore():
+    return AdaptiveSemaphore(
+        MAX_CONCURRENT_REQUESTS,
+        MIN_CONCURRENT_REQUESTS,
+        MAX_CONCURRENT_REQUESTS_CEILING
+    )
+
+# Function to fetch one URL and hand the record to the COPY consumer as soon as it arrives
+async def fetch_and_enqueue(session, url, semaphore, retries, queue, consumer):
+    result = await fetch_with_retry(session, url, semaphore, retries)
+    if queue is not None and result is not None:
+        await enqueue_record(queue, consumer, to_db_record(result))
+    return result
+
+# Function to fetch data from all URLs with controlled concurrency
+async def fetch_batch(session, semaphore, urls, batch_number, queue=None, consumer=None):
+    retries = MAX_RETRIES
+    if circuit_open():
+        retries = 1
+        logger.warning(f"Batch {batch_number}: too many recent server errors, retries disabled")
+    
+    logger.info(f"Batch {batch_number}: Fetching {len(urls)} URLs...")
+    # TaskGroup: an unexpected error or an abort cancels every in-flight request
+    async with asyncio.TaskGroup() as tg:
+        tasks = [
+            tg.create_task(fetch_and_enqueue(
+                session, f"https://collections.louvre.fr{url}.json", semaphore, retries, queue, consumer
+            ))
+            for url in urls
+        ]
+    results = [task.result() for task in tasks]
+    
+    # Statistiques
+    successful = sum(1 for r in results if r is not None)
+    failed = len(results) - successful
+    logger.info(f"Batch {batch_number}: {successful} successful, {failed} failed")
+    
+    # Adjust concurrency between batches, once the batch statistics are known
+    limit = semaphore.adjust()
+    logger.info(f"Batch {batch_number}: concurrency for next batch = {limit}")
+    
+    return results
 
 # Fonction pour sauvegarder un batch
 def save_batch(data, batch_number):
@@ -108,58 +367,124 @@ def save_batch(data, batch_number):
     # Normaliser en DataFrame
     df = pd.json_normalize(filtered_data)
     
-    # Sauvegarder le batch
-    batch_file = OUTPUT_DIR / f"batch_{batch_number:04d}.csv"
-    df.to_csv(batch_file, index=False, encoding='utf-8-sig', escapechar='\\')
+    # Sauvegarder le batch en Parquet, toutes les colonnes en string (comme
+    # dans un CSV) pour que les batches restent concaténables entre eux ;
+    # les chaînes vides deviennent null, comme à la relecture d'un CSV
+    batch_file = batch_file_path(batch_number)
+    table = pa.Table.from_pandas(df.astype('string').replace('', pd.NA), preserve_index=False)
+    pq.write_table(table, batch_file)
     logger.info(f"Batch {batch_number}: Saved {len(df)} rows to {batch_file}")
     
     return df
 
 # Fonction principale pour traiter tous les batches
 async def process_all_batches():
-    total_urls = len(df_urls)
+    total_urls = len(urls)
     num_batches = (total_urls + BATCH_SIZE - 1) // BATCH_SIZE
     
     logger.info(f"Processing {total_urls} URLs in {num_batches} batches of {BATCH_SIZE}")
     
+    # Vidage de la table uniquement sans shards : chaque shard viderait sinon
+    # les lignes déjà envoyées par les autres (à vider avant de lancer les shards)
+    queue, consumer = start_copy_consumer(truncate=NUM_SHARDS == 1)
     all_dataframes = []
+    completed = False
     
-    for i in range(num_batches):
-        start_idx = i * BATCH_SIZE
-        end_idx = min((i + 1) * BATCH_SIZE, total_urls)
-        batch_number = i + 1
-        
-        logger.info(f"\n{'='*60}")
-        logger.info(f"Starting batch {batch_number}/{num_batches} (URLs {start_idx} to {end_idx})")
-        logger.info(f"{'='*60}")
-        
-        # Extraire les URLs du batch
-        batch_urls = df_urls['url'][start_idx:end_idx]
-        
-        # Fetch les données
-        data = await fetch_batch(batch_urls, batch_number)
-        
-        # Sauvegarder le batch
-        df_batch = save_batch(data, batch_number)
-        
-        if df_batch is not None:
-            all_dataframes.append(df_batch)
-        
-        # Pause entre les batches pour éviter de surcharger le serveur
-        if i < num_batches - 1:
-            logger.info("Pausing 5 seconds before next batch...")
-            await asyncio.sleep(5)
+    try:
+        semaphore = create_semaphore()
+        async with create_session() as session:
+            for i in range(num_batches):
+                start_idx = i * BATCH_SIZE
+                end_idx = min((i + 1) * BATCH_SIZE, total_urls)
+                batch_number = i + 1
+                
+                logger.info(f"\n{'='*60}")
+                logger.info(f"Starting batch {batch_number}/{num_batches} (URLs {start_idx} to {end_idx})")
+                logger.info(f"{'='*60}")
+                
+                # Extraire les URLs du batch
+                batch_urls = urls[start_idx:end_idx]
+                
+                # Fetch les données
+                data = await fetch_batch(session, semaphore, batch_urls, batch_number, queue, consumer)
+                
+                # Sauvegarder le batch
+                df_batch = save_batch(data, batch_number)
+                
+                if df_batch is not None:
+                    all_dataframes.append(df_batch)
+                
+                # Arrêt du chargement en continu si le consumer a échoué
+                if queue is not None and not copy_consumer_alive(consumer):
+                    queue = None
+                
+                # Pause entre les batches pour éviter de surcharger le serveur
+                if i < num_batches - 1:
+                    logger.info("Pausing 5 seconds before next batch...")
+                    await asyncio.sleep(5)
+        completed = True
+    finally:
+        await stop_copy_consumer(queue, consumer, abort=not completed)
     
     return all_dataframes
 
+# Démarre le consumer COPY si le chargement en continu est activé
+def start_copy_consumer(truncate=False):
+    if not STREAM_TO_SUPABASE:
+        return None, None
+    # Queue bornée : le scraping attend le consumer plutôt que d'accumuler
+    # les lignes en mémoire
+    queue = asyncio.Queue(maxsize=COPY_QUEUE_SIZE)
+    consumer = asyncio.create_task(copy_consumer(queue, truncate=truncate))
+    return queue, consumer
+
+# Ajoute une ligne pour le consumer COPY ; si la queue est pleine, attend
+# une place libre ou l'arrêt du consumer (la ligne est alors abandonnée)
+async def enqueue_record(queue, consumer, record):
+    if not queue.full():
+        queue.put_nowait(record)
+        return
+    put = asyncio.ensure_future(queue.put(record))
+    try:
+        await asyncio.wait({put, consumer}, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        put.cancel()
+
+# Vérifie que le consumer COPY tourne toujours ; s'il s'est arrêté sur une
+# erreur, le scraping continue (les batches restent chargeables ensuite
+# avec load_to_supabase.py)
+def copy_consumer_alive(consumer):
+    if not consumer.done():
+        return True
+    error = consumer.exception()
+    logger.error(f"COPY consumer stopped: {type(error).__name__}: {error} - streaming disabled")
+    return False
+
+# Arrête le consumer COPY : signal de fin et attente du dernier envoi, ou
+# annulation (et fermeture de sa connexion) si le scraping a été interrompu
+async def stop_copy_consumer(queue, consumer, abort=False):
+    if queue is None or not copy_consumer_alive(consumer):
+        return
+    if abort:
+        consumer.cancel()
+    else:
+        await enqueue_record(queue, consumer, None)
+    try:
+        await consumer
+    except asyncio.CancelledError:
+        if not abort:
+            raise
+    except Exception as e:
+        logger.error(f"COPY consumer failed: {type(e).__name__}: {e}")
+
 # Fonction pour fusionner tous les batches
 def merge_all_batches():
     logger.info("\n" + "="*60)
     logger.info("Merging all batches...")
     logger.info("="*60)
     
-    # Lire tous les fichiers CSV du dossier output_data
-    batch_files = sorted(OUTPUT_DIR.glob("batch_*.csv"))
+    # Lire tous les fichiers Parquet du dossier output_batches
+    batch_files = sorted(OUTPUT_DIR.glob("batch_*.parquet"))
     
     if not batch_files:
         logger.error("No batch files found!")
@@ -170,7 +495,7 @@ def merge_all_batches():
     # Lire et concaténer tous les batches
     dfs = []
     for batch_file in batch_files:
-        df = pd.read_csv(batch_file, encoding='utf-8-sig')
+        df = pd.read_parquet(batch_file)
         dfs.append(df)
         logger.info(f"Loaded {batch_file.name}: {len(df)} rows")
     
@@ -197,36 +522,51 @@ def merge_all_batches():
 
 # Fonction pour reprendre à partir d'un batch spécifique (si plantage)
 async def resume_from_batch(start_batch):
-    total_urls = len(df_urls)
+    total_urls = len(urls)
     num_batches = (total_urls + BATCH_SIZE - 1) // BATCH_SIZE
     
     logger.info(f"Resuming from batch {start_batch}/{num_batches}")
     
-    for i in range(start_batch - 1, num_batches):
-        start_idx = i * BATCH_SIZE
-        end_idx = min((i + 1) * BATCH_SIZE, total_urls)
-        batch_number = i + 1
-        
-        # Vérifier si le batch existe déjà
-        batch_file = OUTPUT_DIR / f"batch_{batch_number:04d}.csv"
-        if batch_file.exists():
-            logger.info(f"Batch {batch_number} already exists, skipping...")
-            continue
-        
-        logger.info(f"\n{'='*60}")
-        logger.info(f"Processing batch {batch_number}/{num_batches} (URLs {start_idx} to {end_idx})")
-        logger.info(f"{'='*60}")
-        
-        batch_urls = df_urls['url'][start_idx:end_idx]
-        data = await fetch_batch(batch_urls, batch_number)
-        save_batch(data, batch_number)
-        
-        if i < num_batches - 1:
-            await asyncio.sleep(5)
+    queue, consumer = start_copy_consumer()
+    completed = False
+    
+    try:
+        semaphore = create_semaphore()
+        async with create_session() as session:
+            for i in range(start_batch - 1, num_batches):
+                start_idx = i * BATCH_SIZE
+                end_idx = min((i + 1) * BATCH_SIZE, total_urls)
+                batch_number = i + 1
+                
+                # Vérifier si le batch existe déjà
+                batch_file = batch_file_path(batch_number)
+                if batch_file.exists():
+                    logger.info(f"Batch {batch_number} already exists, skipping...")
+                    continue
+                
+                logger.info(f"\n{'='*60}")
+                logger.info(f"Processing batch {batch_number}/{num_batches} (URLs {start_idx} to {end_idx})")
+                logger.info(f"{'='*60}")
+                
+                batch_urls = urls[start_idx:end_idx]
+                data = await fetch_batch(session, semaphore, batch_urls, batch_number, queue, consumer)
+                save_batch(data, batch_number)
+                
+                if queue is not None and not copy_consumer_alive(consumer):
+                    queue = None
+                
+                if i < num_batches - 1:
+                    await asyncio.sleep(5)
+        completed = True
+    finally:
+        await stop_copy_consumer(queue, consumer, abort=not completed)
 
 # EXÉCUTION PRINCIPALE
 if __name__ == "__main__":
     try:
+        if uvloop is not None:
+            asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        
         # Option 1 : Tout scraper depuis le début
         logger.info("Starting full scraping process...")
         asyncio.run(process_all_batches())
@@ -234,13 +574,17 @@ if __name__ == "__main__":
         # Option 2 : Reprendre à partir du batch 10 (si plantage)
         # asyncio.run(resume_from_batch(10))
         
-        # Fusionner tous les batches
-        df_final = merge_all_batches()
-        
-        logger.info("\n" + "="*60)
-        logger.info("SCRAPING COMPLETED SUCCESSFULLY!")
-        logger.info(f"Final dataset shape: {df_final.shape}")
-        logger.info("="*60)
+        # Fusionner tous les batches, une seule fois : avec plusieurs shards,
+        # lancer merge_batches.py quand tous les shards sont terminés
+        if NUM_SHARDS > 1:
+            logger.info(f"Shard {SHARD_ID + 1}/{NUM_SHARDS} completed, run merge_batches.py once all shards are done")
+        else:
+            df_final = merge_all_batches()
+            
+            logger.info("\n" + "="*60)
+            logger.info("SCRAPING COMPLETED SUCCESSFULLY!")
+            logger.info(f"Final dataset shape: {df_final.shape}")
+            logger.info("="*60)
         
     except Exception as e:
         logger.error(f"Fatal error: {type(e).__name__}: {e}", exc_info=True)
\ No newline at end of file
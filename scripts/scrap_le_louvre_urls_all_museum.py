@@ -1,46 +1,183 @@
 import os
+import gzip
+import random
+import socket
 import logging
+import orjson
 import scrapy
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+from itemadapter import ItemAdapter
+from lxml import etree
 from scrapy.crawler import CrawlerProcess
+from scrapy.dupefilters import RFPDupeFilter
+from scrapy.exceptions import DropItem
+
+# selectolax's lexbor HTML parser is used for extraction when installed,
+# the compiled lxml XPath expressions otherwise
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+# uvloop (libuv) event loop under the asyncio reactor when installed
+# (not available on Windows)
+try:
+    import uvloop
+except ImportError:
+    uvloop = None
+
+# HTTP/2 download handler when the h2 package (Scrapy's http2 extra) is installed
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+# Realistic desktop User-Agents, one picked at random for each request
+USER_AGENTS = [
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/97.0.4692.99 Safari/537.36',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/97.0.4692.99 Safari/537.36',
+    'Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:96.0) Gecko/20100101 Firefox/96.0',
+    'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.2 Safari/605.1.15',
+    'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/97.0.4692.99 Safari/537.36',
+]
+
+class RandomUserAgentMiddleware:
+    # Runs before Scrapy's UserAgentMiddleware, which then keeps the header set here
+    def process_request(self, request, spider):
+        request.headers['User-Agent'] = random.choice(USER_AGENTS)
+
+class PageDupeFilter(RFPDupeFilter):
+    # Result pages only differ by their page query parameter: keep the page
+    # numbers seen in a set instead of a SHA1 over the whole canonicalized
+    # request; other requests go through the default fingerprint
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.pages_seen = set()
+
+    def request_seen(self, request):
+        page = parse_qs(urlsplit(request.url).query).get('page')
+        if not page:
+            return super().request_seen(request)
+        if page[0] in self.pages_seen:
+            return True
+        self.pages_seen.add(page[0])
+        return False
+
+class DedupePipeline:
+    # Drop the works of art already seen on a previous page, by url, before
+    # they are written (an exact set: a few thousand short strings)
+    def open_spider(self, spider):
+        self._seen = set()
+
+    def process_item(self, item, spider):
+        url = item['url']
+        if url in self._seen:
+            raise DropItem(f'Duplicate url: {url}')
+        self._seen.add(url)
+        return item
+
+class BufferedJsonlPipeline:
+    # Write the items as gzip-compressed JSON Lines, serialized with orjson
+    # (straight to bytes) and collected in a buffer flushed every 64 KB
+    # instead of one small write per item
+    BUFFER_SIZE = 1 << 16
+
+    def open_spider(self, spider):
+        self._fp = gzip.open(spider.settings.get('OUTPUT_FILE'), 'wb')
+        self._buf = bytearray()
+
+    def process_item(self, item, spider):
+        self._buf += orjson.dumps(ItemAdapter(item).asdict())
+        self._buf += b'\n'
+        if len(self._buf) >= self.BUFFER_SIZE:
+            self._fp.write(self._buf)
+            self._buf.clear()
+        return item
+
+    def close_spider(self, spider):
+        self._fp.write(self._buf)
+        self._buf.clear()
+        self._fp.close()
 
 class LouvreSpider(scrapy.Spider):
     name = "louvre"
-    start_urls = [
-        'https://collections.louvre.fr/recherche?location%5B0%5D=141080&location%5B1%5D=190540&location%5B2%5D=147894&location%5B3%5D=234132&location%5B4%5D=124117',
-    ]
+
+    # XPath expressions compiled once for the class, applied to each page's lxml tree.
+    # Rows are the result cards (article with a title link) of the results list,
+    # name and url are read relative to each card rather than through the
+    # page's positional div[2]/div[2]/div[1] layout
+    _XP_ROWS = etree.XPath('//section//ul/li/article[.//h3/a]')
+    # Name: whole text of the title link (child elements included), as
+    # lexbor's deep text(), stripped the same way in both paths
+    _XP_NAME = etree.XPath('string(.//h3/a)')
+    _XP_URL = etree.XPath('./div/div[1]/a/@href')
+
+    # CSS equivalents of the XPath expressions, for selectolax
+    _CSS_ROWS = 'section ul > li > article'
+    _CSS_NAME = 'h3 a'
+    _CSS_URL = 'article > div > div:first-of-type > a'
+
+    # Number of result pages, known in advance so that every page can be
+    # requested up front instead of after page 1 has been parsed
+    TOTAL_PAGES = 500
+    START_URL = 'https://collections.louvre.fr/recherche?location%5B0%5D=141080&location%5B1%5D=190540&location%5B2%5D=147894&location%5B3%5D=234132&location%5B4%5D=124117'
+    PAGE_URL = 'https://collections.louvre.fr/en/recherche?page={page_number}'
+
+    # Let the downloader keep several requests in flight on the same domain
+    custom_settings = {
+        'CONCURRENT_REQUESTS': 32,
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 16,
+    }
+
+    @classmethod
+    def page_urls(cls):
+        yield cls.START_URL
+        for page_number in range(2, cls.TOTAL_PAGES + 1):
+            yield cls.PAGE_URL.format(page_number=page_number)
+
+    async def start(self):
+        # Scrapy >= 2.13 reads the initial requests from start() only
+        for url in self.page_urls():
+            yield scrapy.Request(url, callback=self.parse)
+
+    def start_requests(self):
+        # Scrapy < 2.13
+        for url in self.page_urls():
+            yield scrapy.Request(url, callback=self.parse)
 
     def parse(self, response):
-        # Scraping the elements on the current page
-        for i in range(1, 21):
-            name = response.xpath(f'//section/div[2]/div[2]/div[1]/ul/li[{i}]/article/div/div[2]/h3/a/text()').get()
-            url = response.xpath(f'//section/div[2]/div[2]/div[1]/ul/li[{i}]/article/div/div[1]/a/@href').get()
-            
-            if name and url:
+        # Scraping the elements on the current page, same callback for all pages
+        yield from self.parse_items(response)
+
+    def parse_items(self, response):
+        if LexborHTMLParser is not None:
+            yield from self.parse_items_lexbor(response)
+            return
+
+        # Select all result rows in a single traversal, then read each row's
+        # name and url relative to it (instead of one positional query per li[i])
+        root = response.selector.root
+        for row in self._XP_ROWS(root):
+            name = self._XP_NAME(row).strip()
+            urls = self._XP_URL(row)
+            if name and urls and urls[0]:
                 yield {
                     'name': name,
-                    'url': url,
+                    'url': str(urls[0]),
                 }
-        
-        # Extracting the total number of pages
-        total_pages = response.xpath('/html/body/div[1]/main/section/div[2]/div[2]/div[2]/nav/form/span[2]/text()').get()
-        if total_pages:
-            total_pages = int(total_pages.split()[-1])  # Extracting the last number from the text
-        else:
-            total_pages = 1
-
-        # Logging the total number of pages
-        self.log(f"Total number of pages: {total_pages}", level=logging.INFO)
-        
-        # Iterate through each page and scrape data
-        for page_number in range(2, total_pages + 1):
-            next_page_url = f'https://collections.louvre.fr/en/recherche?page={page_number}'
-            yield scrapy.Request(next_page_url, callback=self.parse_page)
-
-    def parse_page(self, response):
-        # Scraping the elements on the current page
-        for i in range(1, 21):
-            name = response.xpath(f'//section/div[2]/div[2]/div[1]/ul/li[{i}]/article/div/div[2]/h3/a/text()').get()
-            url = response.xpath(f'//section/div[2]/div[2]/div[1]/ul/li[{i}]/article/div/div[1]/a/@href').get()
+
+    def parse_items_lexbor(self, response):
+        # lexbor parses the page into a flat node array, faster to walk than
+        # lxml's DOM; only two lookups are needed per result card
+        tree = LexborHTMLParser(response.text)
+        for article in tree.css(self._CSS_ROWS):
+            name_node = article.css_first(self._CSS_NAME)
+            url_node = article.css_first(self._CSS_URL)
+            if name_node is None or url_node is None:
+                continue
+            name = name_node.text(deep=True).strip()
+            url = url_node.attributes.get('href')
             if name and url:
                 yield {
                     'name': name,
@@ -48,28 +185,105 @@ class LouvreSpider(scrapy.Spider):
                 }
 
 # Name of the file where the results will be saved
-filename = "urls_le_louvre_all.json"
+filename = "urls_le_louvre_all.jsonl.gz"
 
-# Directory to save the file
-save_dir = os.path.join(os.path.dirname(__file__), '..', 'data')
+# Absolute path to the file, resolved once, in the data directory
+filepath = Path(__file__).resolve().parent.parent / 'data' / filename
+filepath.parent.mkdir(parents=True, exist_ok=True)
 
-# Absolute path to the file
-filepath = os.path.join(save_dir, filename)
+# Settings of the CrawlerProcess
+settings = {
+    'USER_AGENT': USER_AGENTS[0],
+    'DOWNLOADER_MIDDLEWARES': {
+        RandomUserAgentMiddleware: 400,
+    },
+    # Result pages deduplicated by their page number
+    'DUPEFILTER_CLASS': PageDupeFilter,
+    # Adapt the request rate to the server's latency and back off on errors
+    # instead of hammering it (and getting banned) at full concurrency
+    'AUTOTHROTTLE_ENABLED': True,
+    'AUTOTHROTTLE_START_DELAY': 1,
+    'AUTOTHROTTLE_MAX_DELAY': 30,
+    'AUTOTHROTTLE_TARGET_CONCURRENCY': 4.0,
+    'RANDOMIZE_DOWNLOAD_DELAY': True,
+    'RETRY_HTTP_CODES': [429, 500, 502, 503, 504],
+    # Only warnings and errors, with the crawl stats logged once a minute
+    'LOG_LEVEL': logging.WARNING,
+    'LOGSTATS_INTERVAL': 60,
+    # Duplicate urls dropped, then items written by BufferedJsonlPipeline as gzip-compressed JSON Lines;
+    # the file is opened in write mode, replacing the previous results
+    'ITEM_PIPELINES': {
+        DedupePipeline: 200,
+        BufferedJsonlPipeline: 300,
+    },
+    'OUTPUT_FILE': filepath,
+    # Cache responses on disk and revalidate them with conditional GETs
+    # (ETag / Last-Modified): unchanged pages come back as empty 304s on re-runs
+    'HTTPCACHE_ENABLED': True,
+    'HTTPCACHE_POLICY': 'scrapy.extensions.httpcache.RFC2616Policy',
+    'HTTPCACHE_STORAGE': 'scrapy.extensions.httpcache.FilesystemCacheStorage',
+    'HTTPCACHE_DIR': '.httpcache',
+    'TWISTED_REACTOR': 'twisted.internet.asyncioreactor.AsyncioSelectorReactor',
+}
 
-# If file already exists, delete it before crawling (because Scrapy will 
-# concatenate the last and new results otherwise)
-if os.path.exists(filepath):
-    os.remove(filepath)
+# HTTP/2: the concurrent page requests are multiplexed over a single TLS
+# connection to the host instead of one handshake per slot. Scrapy's H2
+# handler is experimental and does not support proxies, so a distributed
+# crawl that goes out through proxies needs h2 left uninstalled
+if h2 is not None:
+    settings['DOWNLOAD_HANDLERS'] = {
+        'https': 'scrapy.core.downloader.handlers.http2.H2DownloadHandler',
+    }
+
+# Run the asyncio reactor on uvloop when it is installed
+if uvloop is not None:
+    settings['ASYNCIO_EVENT_LOOP'] = 'uvloop.Loop'
+
+spider_class = LouvreSpider
+
+# Distributed crawl: when REDIS_URL is set, every worker (one per machine/IP)
+# pops the page urls from a list shared in Redis, so each page is crawled by
+# a single worker. The list is filled once per crawl by running one worker
+# with REDIS_SEED=1, and a worker stops once the list has stayed empty for
+# MAX_IDLE_TIME_BEFORE_CLOSE seconds. Each worker writes its own output file,
+# the gzip files can be concatenated as-is (cat urls_le_louvre_all_*.jsonl.gz).
+redis_url = os.getenv('REDIS_URL')
+if redis_url:
+    from scrapy_redis.spiders import RedisSpider
+
+    class LouvreRedisSpider(RedisSpider, LouvreSpider):
+        # Urls read from Redis are requested with dont_filter: a new seed is
+        # crawled again even though the dupefilter persists between runs
+        redis_key = 'louvre:start_urls'
+
+        async def start(self):
+            # Scrapy >= 2.13: first requests popped from the Redis list
+            # (RedisMixin.start_requests) rather than LouvreSpider's pages
+            for request in self.start_requests():
+                yield request
+
+    if os.getenv('REDIS_SEED') == '1':
+        import redis
+        # The list is replaced, not appended to: re-seeding never queues a page twice
+        pipe = redis.from_url(redis_url).pipeline()
+        pipe.delete(LouvreRedisSpider.redis_key)
+        pipe.rpush(LouvreRedisSpider.redis_key, *(orjson.dumps({'url': url}) for url in LouvreSpider.page_urls()))
+        pipe.execute()
+
+    worker_id = os.getenv('WORKER_ID', socket.gethostname())
+    settings.update({
+        'SCHEDULER': 'scrapy_redis.scheduler.Scheduler',
+        'DUPEFILTER_CLASS': 'scrapy_redis.dupefilter.RFPDupeFilter',
+        'SCHEDULER_PERSIST': True,
+        'MAX_IDLE_TIME_BEFORE_CLOSE': 60,
+        'REDIS_URL': redis_url,
+        'OUTPUT_FILE': filepath.with_name(f"urls_le_louvre_all_{worker_id}.jsonl.gz"),
+    })
+    spider_class = LouvreRedisSpider
 
 # Declare a new CrawlerProcess with some settings
-process = CrawlerProcess(settings={
-    'USER_AGENT': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/97.0.4692.99 Safari/537.36',
-    'LOG_LEVEL': logging.INFO,
-    "FEEDS": {
-        filepath: {"format": "json"},
-    }
-})
+process = CrawlerProcess(settings=settings)
 
 # Start the crawling using the spider you defined above
-process.crawl(LouvreSpider)
+process.crawl(spider_class)
 process.start()